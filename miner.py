@@ -10,20 +10,29 @@ import os
 import random
 import requests
 import sha256
+import socket
+import socketserver
 import ssl
+import struct
 import sys
 import time
-import numpy as np
-import pyopencl as cl
-from queue import Queue
-from threading import Thread, RLock
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import Queue, Empty
+from threading import Thread, RLock, Condition, Event
 from urllib.parse import urljoin
 
+# numpy and pyopencl are slow to import, they are loaded by import_libs() when needed
+np = None
+cl = None
+
 DEFAULT_POOL_URL = 'https://next.ton-pool.club'
 DEFAULT_WALLET = 'EQBoG6BHwfFPTEUsxXW8y0TyHN9_5Z1_VIb2uctCd-NDmCbx'
 VERSION = '0.3.2'
 
 DEVFEE_POOL_URLS = ['https://next.ton-pool.club', 'https://next.ton-pool.com']
+WS_MAGIC = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+SUBMIT_TIMEOUT = 3
+MAX_SUBMIT_SIZE = 16384
 
 
 headers = {'user-agent': 'ton-pool-miner/' + VERSION}
@@ -33,7 +42,11 @@ hashes_count_devfee = 0
 hashes_count_per_device = []
 hashes_lock = RLock()
 cur_task = None
+cur_task_time = 0
+upstream_pool_url = None
 task_lock = RLock()
+task_ready = Event()
+libs_ready = Event()
 share_report_queue = Queue()
 shares_count = 0
 shares_accepted = 0
@@ -42,6 +55,65 @@ shares_lock = RLock()
 pool_has_results = False
 ws_available = False
 
+start_time = time.time()
+startup_stages = []
+startup_lock = RLock()
+startup_profile = False
+first_job_time = None
+first_share_time = None
+startup_reported = False
+wallet_checked = Event()
+
+
+def import_libs():
+    global np, cl
+    import numpy as np
+    import pyopencl as cl
+    libs_ready.set()
+
+
+def record_stage(name, st):
+    with startup_lock:
+        startup_stages.append((name, st - start_time, time.time() - start_time))
+
+
+def record_first_job():
+    global first_job_time
+    with startup_lock:
+        if first_job_time is None:
+            first_job_time = time.time()
+            record_stage('first job', start_time)
+
+
+def record_first_share():
+    global first_share_time
+    with startup_lock:
+        if first_share_time is not None:
+            return
+        first_share_time = time.time()
+        record_stage('first share', start_time)
+        reported = startup_reported
+    # finding a share can take minutes, so it is usually reported after the profile
+    if startup_profile and reported:
+        logging.warning('startup profile: time to first share %.2fs' % (first_share_time - start_time))
+
+
+def report_startup(workers):
+    global startup_reported
+    wallet_checked.wait()
+    for w in workers:
+        w.hashing.wait()
+    with startup_lock:
+        stages = sorted(startup_stages, key=lambda x: x[2])
+        startup_reported = True
+    # logged as a warning so it is also shown with --silent
+    logging.warning('startup profile:')
+    for name, st, ed in stages:
+        logging.warning('    %-50s %6.2fs - %6.2fs (%.2fs)' % (name, st, ed, ed - st))
+    hashed = [ed for name, st, ed in stages if name.startswith('first hash on ')]
+    if hashed:
+        logging.warning('    %-50s %6.2fs' % ('time to first hash on all devices', max(hashed)))
+
 
 def count_hashes(num, device_id, count_devfee):
     global hashes_count, hashes_count_devfee
@@ -93,11 +165,18 @@ def report_share():
 
 
 def load_task(r, src, submit_conf):
-    global cur_task
+    global cur_task, cur_task_time, upstream_pool_url
     wallet_b64 = r['wallet']
     wallet = base64.urlsafe_b64decode(wallet_b64)
     assert wallet[1] * 4 % 256 == 0
-    prefix = bytes(map(lambda x, y: x ^ y, b'\0' * 4 + os.urandom(28), bytes.fromhex(r['prefix']).ljust(32, b'\0')))
+    # the first job can arrive before the main thread has imported numpy
+    libs_ready.wait()
+    # jobs served by a proxy carry the url of the pool behind it
+    if 'pool' in r:
+        upstream_pool_url = r['pool']
+    # a proxy fixes more prefix bytes to give each miner a disjoint range
+    fixed = r.get('prefix_len', 4)
+    prefix = bytes(map(lambda x, y: x ^ y, b'\0' * fixed + os.urandom(32 - fixed), bytes.fromhex(r['prefix']).ljust(32, b'\0')))
     input = b'\0\xf2Mine\0' + r['expire'].to_bytes(4, 'big') + wallet[2:34] + prefix + bytes.fromhex(r['seed']) + prefix
     complexity = bytes.fromhex(r['complexity'])
 
@@ -109,6 +188,8 @@ def load_task(r, src, submit_conf):
     new_task = [0, input, r['giver'], complexity, hash_state, suffix_arr, time.time(), submit_conf, wallet_b64 == DEFAULT_WALLET]
     with task_lock:
         cur_task = new_task
+        cur_task_time = new_task[6]
+        task_ready.set()
     logging.debug('successfully loaded new task from %s: %s' % (src, new_task))
 
 
@@ -123,7 +204,7 @@ def is_ton_pool_com(pool_url):
 
 def update_task_devfee():
     while True:
-        if not is_ton_pool_com(pool_url) and hashes_count_devfee + 4 * 10**10 < hashes_count // 100:
+        if not is_ton_pool_com(upstream_pool_url or pool_url) and hashes_count_devfee + 4 * 10**10 < hashes_count // 100:
             try:
                 url = random.choice(DEVFEE_POOL_URLS)
                 r = requests.get(urljoin(url, '/job'), headers=headers, timeout=10).json()
@@ -133,11 +214,28 @@ def update_task_devfee():
         time.sleep(5 + random.random() * 5)
 
 
-def update_task(limit):
+def check_wallet():
+    st = time.time()
+    try:
+        r = requests.get(urljoin(pool_url, '/wallet/' + wallet), headers=headers, timeout=10)
+    except Exception as e:
+        logging.info('failed to connect to pool: ' + str(e))
+        os._exit(1)
+    r = r.json()
+    if 'ok' not in r:
+        logging.info('please check your wallet address: ' + r['msg'])
+        os._exit(1)
+    record_stage('wallet check', st)
+    wallet_checked.set()
+
+
+def update_task(limit, loader=load_task):
     while True:
         try:
-            r = requests.get(urljoin(pool_url, '/job'), headers=headers, timeout=10).json()
-            load_task(r, '/job', (pool_url, wallet))
+            r = requests.get(urljoin(pool_url, '/job'), headers=headers, timeout=10)
+            if r.status_code == 200:
+                record_first_job()
+            loader(r.json(), '/job', (pool_url, wallet))
         except Exception as e:
             logging.warning('failed to fetch new job: %s' % e)
             time.sleep(5)
@@ -149,11 +247,11 @@ def update_task(limit):
             time.sleep(17 + random.random() * 5)
         else:
             time.sleep(3 + random.random() * 5)
-        if time.time() - cur_task[6] > 60:
-            logging.error('failed to fetch new job for %.2fs, please check your network connection!' % (time.time() - cur_task[6]))
+        if time.time() - cur_task_time > 60:
+            logging.error('failed to fetch new job for %.2fs, please check your network connection!' % (time.time() - cur_task_time))
 
 
-def update_task_ws():
+def update_task_ws(loader=load_task):
     global ws_available
     try:
         from websocket import create_connection
@@ -177,8 +275,9 @@ def update_task_ws():
         try:
             ws = create_connection(ws_url, timeout=10, header=headers, sslopt={'cert_reqs': ssl.CERT_NONE})
             while True:
-                r = json.loads(ws.recv())
-                load_task(r, '/job-ws', (pool_url, wallet))
+                r = ws.recv()
+                record_first_job()
+                loader(json.loads(r), '/job-ws', (pool_url, wallet))
         except Exception as e:
             logging.critical('=' * 50 + str(e))
             time.sleep(random.random() * 5 + 2)
@@ -225,16 +324,20 @@ class Worker:
     def __init__(self, device, program, threads, id):
         self.device = device
         self.device_id = id
-        self.context = cl.Context(devices=[device], dev_type=None)
-        self.queue = cl.CommandQueue(self.context)
-        self.program = cl.Program(self.context, program).build()
-        self.kernels = self.program.all_kernels()
+        self.source = program
+        self.hashing = Event()
         if threads is None:
             threads = device.max_compute_units * device.max_work_group_size
             if device.type & 4 == 0:
                 threads = device.max_work_group_size
         self.threads = threads
 
+    def build(self):
+        self.context = cl.Context(devices=[self.device], dev_type=None)
+        self.queue = cl.CommandQueue(self.context)
+        self.program = cl.Program(self.context, self.source).build()
+        self.kernels = self.program.all_kernels()
+
     def run_task(self, kernel, iterations):
         mf = cl.mem_flags
         input, giver, complexity, suffix_arr, global_it, tm, submit_conf, count_devfee, args = get_task(iterations)
@@ -269,7 +372,11 @@ class Worker:
                     logging.warning('hash integrity error, please check your graphics card drivers')
                 if h < complexity:
                     share_report_queue.put((input_new[:123].hex(), giver, h, tm, submit_conf))
+                    record_first_share()
         count_hashes(self.threads * iterations, self.device_id, count_devfee)
+        if not self.hashing.is_set():
+            record_stage('first hash on %s' % get_device_id(self.device), start_time)
+            self.hashing.set()
 
     def warmup(self, kernel, time_limit):
         iterations = 4096
@@ -351,6 +458,14 @@ class Worker:
 
     def run(self):
         dd = get_device_id(self.device)
+        st = time.time()
+        try:
+            self.build()
+        except Exception as e:
+            logging.error('failed to build opencl program for %s: %s' % (dd, e))
+            os._exit(1)
+        record_stage('build %s' % dd, st)
+        task_ready.wait()
         pending_benchmark = []
         for kernel in self.kernels:
             if dd + ':' + kernel.function_name not in benchmark_data:
@@ -369,11 +484,287 @@ class Worker:
             self.run_task(self.best_kernel, self.iterations)
 
 
+def is_accepted(res):
+    code, d = res
+    return code == 200 and isinstance(d, dict) and ('accepted' not in d or d['accepted'])
+
+
+class Proxy:
+    def __init__(self, batch_window):
+        self.job = None
+        self.job_version = 0
+        self.job_cond = Condition()
+        self.slot = 0
+        # shares must be answered before the miner's first /submit attempt times out
+        self.batch_window = min(batch_window, SUBMIT_TIMEOUT / 3)
+        self.submit_queue = Queue()
+        self.shares = {}
+        self.shares_lock = RLock()
+        self.clients = 0
+
+    def load_job(self, r, src, submit_conf):
+        global cur_task_time
+        if r.get('prefix_len', 4) + 4 > 32:
+            logging.error('job from %s has no prefix bytes left for the proxy, too many proxies in a chain?' % src)
+            return
+        with self.job_cond:
+            self.job = r
+            self.job_version += 1
+            cur_task_time = time.time()
+            self.job_cond.notify_all()
+        logging.debug('successfully loaded new job from %s: %s' % (src, r))
+
+    def make_job(self):
+        with self.job_cond:
+            if self.job is None:
+                return None
+            r = dict(self.job)
+            self.slot = (self.slot + 1) % 2**32
+            slot = self.slot
+        # behind another proxy the bytes before prefix_len are already taken
+        off = r.get('prefix_len', 4)
+        prefix = bytearray(bytes.fromhex(r['prefix']).ljust(off + 4, b'\0'))
+        for i, x in enumerate(slot.to_bytes(4, 'big')):
+            prefix[off + i] ^= x
+        r['prefix'] = prefix.hex()
+        r['prefix_len'] = off + 4
+        r.setdefault('pool', pool_url)
+        return r
+
+    def submit(self, inputs, giver, miner_addr):
+        items = []
+        with self.shares_lock:
+            for input in inputs:
+                item = self.shares.get(input)
+                # a miner that timed out sends the same share again, it waits for the pending submission
+                if item is None or (item[3].is_set() and item[4][0][1] is None) or (not item[3].is_set() and time.time() - item[5] > SUBMIT_TIMEOUT + 1):
+                    item = (input, giver, miner_addr, Event(), [], time.time())
+                    self.shares[input] = item
+                    self.submit_queue.put(item)
+                items.append(item)
+            while len(self.shares) > 4096:
+                self.shares.pop(next(iter(self.shares)))
+        results = []
+        for item in items:
+            if item[3].wait(max(item[5] + SUBMIT_TIMEOUT + 1 - time.time(), 0)):
+                results.append(item[4][0])
+            else:
+                results.append((502, None))
+        for res in results:
+            if not is_accepted(res):
+                return res
+        return results[0]
+
+    def post_shares(self, giver, miner_addr, inputs, deadline):
+        while True:
+            timeout = deadline - time.time()
+            if timeout < 0.2:
+                return (502, None)
+            try:
+                r = requests.post(urljoin(pool_url, '/submit'), json={'inputs': inputs, 'giver': giver, 'miner_addr': miner_addr}, headers=headers, timeout=timeout)
+                return (r.status_code, r.json())
+            except Exception as e:
+                logging.warning('failed to submit %d shares for %s: %s' % (len(inputs), miner_addr, e))
+                time.sleep(min(0.5, max(deadline - time.time(), 0)))
+
+    def submit_batch(self, giver, miner_addr, items):
+        deadline = min(item[5] for item in items) + SUBMIT_TIMEOUT
+        res = self.post_shares(giver, miner_addr, [item[0] for item in items], deadline)
+        if len(items) > 1 and res[1] is not None and not is_accepted(res):
+            # one bad share gets the whole request rejected, submit them one by one to find it
+            for item in items:
+                th = Thread(target=self.submit_batch, args=(giver, miner_addr, [item]))
+                th.setDaemon(True)
+                th.start()
+            return
+        if is_accepted(res):
+            logging.info('submitted %d shares for %s' % (len(items), miner_addr))
+        elif res[1] is not None:
+            logging.warning('%d shares for %s rejected by pool: %s' % (len(items), miner_addr, res[1]))
+        for item in items:
+            item[4].append(res)
+            item[3].set()
+
+    def report_shares(self):
+        while True:
+            items = [self.submit_queue.get(True)]
+            deadline = time.time() + self.batch_window
+            while True:
+                try:
+                    items.append(self.submit_queue.get(True, max(deadline - time.time(), 0)))
+                except Empty:
+                    break
+            groups = {}
+            for item in items:
+                groups.setdefault((item[1], item[2]), []).append(item)
+            for (giver, miner_addr), group in groups.items():
+                th = Thread(target=self.submit_batch, args=(giver, miner_addr, group))
+                th.setDaemon(True)
+                th.start()
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    server_version = 'ton-pool-proxy/' + VERSION
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug('%s %s' % (self.address_string(), format % args))
+
+    def send_json(self, code, d):
+        body = json.dumps(d).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_ws_frame(self, opcode, data):
+        if len(data) < 126:
+            header = struct.pack('!BB', 0x80 | opcode, len(data))
+        elif len(data) < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, len(data))
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, len(data))
+        self.wfile.write(header + data)
+        self.wfile.flush()
+
+    def read_ws(self, n):
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise EOFError('connection closed')
+        return data
+
+    def read_ws_frames(self):
+        proxy = self.server.proxy
+        try:
+            # miners only send pongs and close frames, they are read and dropped
+            while True:
+                b1, b2 = self.read_ws(2)
+                n = b2 & 0x7f
+                if n == 126:
+                    n = struct.unpack('!H', self.read_ws(2))[0]
+                elif n == 127:
+                    n = struct.unpack('!Q', self.read_ws(8))[0]
+                if n > 65536:
+                    raise ValueError('frame too large')
+                self.read_ws(n + (4 if b2 & 0x80 else 0))
+                if b1 & 0x0f == 0x8:
+                    break
+        except Exception as e:
+            logging.debug('failed to read from miner %s: %s' % (self.address_string(), e))
+        with proxy.job_cond:
+            self.ws_closed = True
+            proxy.job_cond.notify_all()
+
+    def serve_ws(self):
+        proxy = self.server.proxy
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WS_MAGIC).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+        self.ws_closed = False
+        th = Thread(target=self.read_ws_frames)
+        th.setDaemon(True)
+        th.start()
+        version = 0
+        with proxy.job_cond:
+            proxy.clients += 1
+        logging.info('miner %s connected, %d miners subscribed' % (self.address_string(), proxy.clients))
+        try:
+            while True:
+                with proxy.job_cond:
+                    proxy.job_cond.wait_for(lambda: self.ws_closed or (proxy.job is not None and proxy.job_version != version), 5)
+                    if self.ws_closed:
+                        break
+                    updated = proxy.job is not None and proxy.job_version != version
+                    version = proxy.job_version
+                if updated:
+                    self.send_ws_frame(0x1, json.dumps(proxy.make_job()).encode())
+                else:
+                    self.send_ws_frame(0x9, b'')
+            self.send_ws_frame(0x8, b'')
+        except Exception as e:
+            logging.debug('failed to send to miner %s: %s' % (self.address_string(), e))
+        finally:
+            with proxy.job_cond:
+                proxy.clients -= 1
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        logging.info('miner %s disconnected, %d miners subscribed' % (self.address_string(), proxy.clients))
+
+    def do_GET(self):
+        proxy = self.server.proxy
+        if self.path == '/job':
+            r = proxy.make_job()
+            if r is None:
+                self.send_json(503, {'msg': 'no job fetched from pool yet'})
+            else:
+                self.send_json(200, r)
+        elif self.path == '/job-ws':
+            if self.headers.get('Upgrade', '').lower() == 'websocket':
+                self.serve_ws()
+            else:
+                self.send_json(400, {'msg': 'websocket upgrade required'})
+        elif self.path.startswith('/wallet/'):
+            try:
+                r = requests.get(urljoin(pool_url, self.path), headers=headers, timeout=10)
+                self.send_json(r.status_code, r.json())
+            except Exception as e:
+                self.send_json(502, {'msg': 'failed to connect to pool: %s' % e})
+        else:
+            self.send_json(404, {'msg': 'not found'})
+
+    def do_POST(self):
+        proxy = self.server.proxy
+        if self.path != '/submit':
+            self.send_json(404, {'msg': 'not found'})
+            return
+        try:
+            size = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            size = -1
+        if size < 0 or size > MAX_SUBMIT_SIZE:
+            self.close_connection = True
+            self.send_json(413 if size > 0 else 400, {'msg': 'bad request size'})
+            return
+        try:
+            d = json.loads(self.rfile.read(size))
+            inputs, giver, miner_addr = d['inputs'], d['giver'], d['miner_addr']
+            assert len(inputs) > 0, 'no inputs'
+        except Exception as e:
+            self.send_json(400, {'msg': 'bad request: %s' % e})
+            return
+        code, d = proxy.submit(inputs, giver, miner_addr)
+        if d is None:
+            # not a json reply, so the miner retries the submission
+            self.send_error(502, 'failed to submit share to pool')
+        else:
+            self.send_json(code, d)
+
+
+class ProxyServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, proxy):
+        HTTPServer.__init__(self, addr, ProxyHandler)
+        self.proxy = proxy
+
+    def handle_error(self, request, client_address):
+        logging.debug('error while serving %s: %s' % (client_address[0], sys.exc_info()[1]))
+
+
 if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('')
     if sys.argv[1] == 'info':
         print('TON-Pool.com Miner', VERSION)
+        import_libs()
         try:
             platforms = cl.get_platforms()
         except cl.LogicError:
@@ -384,6 +775,37 @@ if __name__ == '__main__':
             for j, device in enumerate(platform.get_devices()):
                 print('    Device %d: %s' % (j, get_device_id(device)))
         os._exit(0)
+    if sys.argv[1] == 'proxy':
+        parser = argparse.ArgumentParser(prog='%s proxy' % sys.argv[0])
+        parser.add_argument('-l', dest='LISTEN', default='0.0.0.0', help='Address to listen on')
+        parser.add_argument('--port', dest='PORT', type=int, default=8080, help='Port to listen on')
+        parser.add_argument('--batch', dest='BATCH', type=float, default=0.5, help='Seconds to collect shares before submitting them to the pool, at most 1')
+        parser.add_argument('--debug', dest='DEBUG', action='store_true', help='Show all logs')
+        parser.add_argument('POOL', help='Pool URL')
+        args = parser.parse_args(sys.argv[2:])
+        logging.basicConfig(format='%(asctime)s [%(levelname)s] %(message)s', level='DEBUG' if args.DEBUG else 'INFO')
+
+        pool_url = args.POOL
+        wallet = None
+        logging.info('starting TON-Pool.com Miner %s in proxy mode on pool %s ...' % (VERSION, pool_url))
+        proxy = Proxy(args.BATCH)
+        update_task(1, proxy.load_job)
+        th = Thread(target=update_task, args=(0, proxy.load_job))
+        th.setDaemon(True)
+        th.start()
+        th = Thread(target=update_task_ws, args=(proxy.load_job,))
+        th.setDaemon(True)
+        th.start()
+        th = Thread(target=proxy.report_shares)
+        th.setDaemon(True)
+        th.start()
+        server = ProxyServer((args.LISTEN, args.PORT), proxy)
+        logging.info('serving miners on http://%s:%d' % (args.LISTEN, args.PORT))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info('exiting...')
+        os._exit(0)
     if sys.argv[1] == 'run':
         run_args = sys.argv[2:]
     elif sys.argv[1].startswith('http') or sys.argv[1].startswith('-'):
@@ -392,6 +814,7 @@ if __name__ == '__main__':
         print('TON-Pool.com Miner', VERSION)
         print('Usage: %s [pool url] [wallet address]' % sys.argv[0])
         print('Run "%s info" to check your system info' % sys.argv[0])
+        print('Run "%s proxy [pool url]" to serve jobs to miners on your local network' % sys.argv[0])
         print('Run "%s -h" to for detailed arguments' % sys.argv[0])
         os._exit(0)
 
@@ -402,6 +825,7 @@ if __name__ == '__main__':
     parser.add_argument('--stats', dest='STATS', action='store_true', help='Dump stats to stats.json')
     parser.add_argument('--debug', dest='DEBUG', action='store_true', help='Show all logs')
     parser.add_argument('--silent', dest='SILENT', action='store_true', help='Only show warnings and errors')
+    parser.add_argument('--startup-profile', dest='STARTUP_PROFILE', action='store_true', help='Show time spent in each startup stage')
     parser.add_argument('POOL', help='Pool URL')
     parser.add_argument('WALLET', help='Your wallet address')
     args = parser.parse_args(run_args)
@@ -417,17 +841,11 @@ if __name__ == '__main__':
     pool_url = args.POOL
     wallet = args.WALLET
     logging.info('starting TON-Pool.com Miner %s on pool %s wallet %s ...' % (VERSION, pool_url, wallet))
-    start_time = time.time()
-    try:
-        r = requests.get(urljoin(pool_url, '/wallet/' + wallet), headers=headers, timeout=10)
-    except Exception as e:
-        logging.info('failed to connect to pool: ' + str(e))
-        os._exit(1)
-    r = r.json()
-    if 'ok' not in r:
-        logging.info('please check your wallet address: ' + r['msg'])
-        os._exit(1)
-    update_task(1)
+    startup_profile = args.STARTUP_PROFILE
+    # the wallet check, job fetching and device setup run at the same time, workers wait for the first job
+    th = Thread(target=check_wallet)
+    th.setDaemon(True)
+    th.start()
     th = Thread(target=update_task, args=(0,))
     th.setDaemon(True)
     th.start()
@@ -442,6 +860,20 @@ if __name__ == '__main__':
         th.setDaemon(True)
         th.start()
 
+    st = time.time()
+    path = os.path.dirname(os.path.abspath(__file__))
+    try:
+        prog = open(os.path.join(path, 'sha256.cl'), 'r').read() + '\n' + open(os.path.join(path, 'hash_solver.cl'), 'r').read()
+    except:
+        logging.info('failed to load opencl program')
+        os._exit(1)
+    record_stage('load opencl program', st)
+
+    st = time.time()
+    import_libs()
+    record_stage('import numpy and pyopencl', st)
+
+    st = time.time()
     platforms = cl.get_platforms()
     if args.PLATFORM is not None:
         t = int(args.PLATFORM)
@@ -463,18 +895,19 @@ if __name__ == '__main__':
         devices += cur_devices
     logging.info('total devices: %d' % len(devices))
     hashes_count_per_device = [0] * len(devices)
+    record_stage('enumerate devices', st)
 
-    path = os.path.dirname(os.path.abspath(__file__))
-    try:
-        prog = open(os.path.join(path, 'sha256.cl'), 'r').read() + '\n' + open(os.path.join(path, 'hash_solver.cl'), 'r').read()
-    except:
-        logging.info('failed to load opencl program')
-        os._exit(1)
+    workers = []
     for i, device in enumerate(devices):
         w = Worker(device, prog, args.THREADS, i)
         th = Thread(target=w.run)
         th.setDaemon(True)
         th.start()
+        workers.append(w)
+    if startup_profile:
+        th = Thread(target=report_startup, args=(workers,))
+        th.setDaemon(True)
+        th.start()
 
     ss = []
     ss.append((time.time(), hashes_count, [0] * len(devices)))